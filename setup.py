@@ -7,12 +7,17 @@ setup(
     package_dir={'': 'src'},
     install_requires=[
         'click',
+        'numba',
         'numpy',
         'pandas',
         'sage',
+        'scipy',
         'tqdm',
     ],
-    python_requires='>=3.6',
+    extras_require={
+        'cuda': ['cupy'],
+    },
+    python_requires='>=3.8',
     entry_points='''
         [console_scripts]
         jeweler=jeweler.cli:cli
@@ -28,6 +28,11 @@ in the `cli` module which called from the `__main__` module if Jeweler is called
 directly using `python -m jeweler` or `jeweler` if Jeweler is installed to the
 PATH.
 
+The `backend` module contains functions for scoring codes on a GPU.
+
+The `bits` module contains functions for packing codes into the bits of
+integers.
+
 The `catalog` module contains already computed best codes using the included
 cost functions. This catalog may be searched using the `best` function.
 
@@ -0,0 +1,47 @@
+"""Provides optional GPU acceleration of the objective functions with CuPy.
+
+Batches are moved to the device before scoring; only the scores are used on
+the host. The objective functions dispatch on the type of array they receive.
+"""
+
+import numpy as np
+
+try:
+    import cupy
+except ImportError:
+    cupy = None
+
+__all__ = [
+    'backends',
+    'check',
+    'get_array_module',
+    'to_device',
+]
+
+backends = [
+    'cpu',
+    'cuda',
+]
+
+
+def get_array_module(array):
+    """Return cupy for arrays on the GPU and numpy otherwise."""
+    if cupy is None:
+        return np
+    return cupy.get_array_module(array)
+
+
+def check(backend):
+    """Raise an error if the given backend is unknown or unavailable."""
+    if backend not in backends:
+        raise ValueError(f"'{backend}' is not one of {backends}.")
+    if backend == 'cuda' and cupy is None:
+        raise ImportError("The 'cuda' backend requires CuPy.")
+
+
+def to_device(array, backend):
+    """Return the array on the device used by the given backend."""
+    check(backend)
+    if backend == 'cuda':
+        return cupy.asarray(array)
+    return array
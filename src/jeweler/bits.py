@@ -0,0 +1,36 @@
+"""Provides functions for codes packed into the bits of unsigned integers.
+
+A binary code of length L <= 64 fits in a single uint64 where bit j is position
+j of the code. Packed batches are 32 times smaller than float32 batches.
+"""
+
+import numpy as np
+
+from jeweler.backend import get_array_module
+
+__all__ = [
+    'pack',
+    'unpack',
+]
+
+
+def pack(codes):
+    """Pack the last axis of an array of binary codes into uint64."""
+    codes = np.asarray(codes)
+    if codes.shape[-1] > 64:
+        raise ValueError("Codes longer than 64 bits cannot be packed.")
+    packed = np.zeros(codes.shape[:-1] + (8,), dtype=np.uint8)
+    packed[..., :-(-codes.shape[-1] // 8)] = np.packbits(
+        codes != 0,
+        axis=-1,
+        bitorder='little',
+    )
+    return packed.view('<u8')[..., 0].astype(np.uint64)
+
+
+def unpack(codes, length, dtype=np.float32):
+    """Unpack uint64 codes into an array of binary codes of the given length."""
+    xp = get_array_module(codes)
+    shifts = xp.arange(length, dtype=xp.uint64)
+    bits = (codes[..., None] >> shifts) & xp.uint64(1)
+    return bits.astype(dtype)
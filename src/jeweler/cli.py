@@ -5,6 +5,7 @@ import os
 
 import click
 
+import jeweler.backend
 import jeweler.catalog
 import jeweler.objective
 import jeweler.search
@@ -40,6 +41,15 @@ logger = logging.getLogger(__name__)
               default=0.5,
               type=click.FLOAT,
               help='Fraction of bits that are one.')
+@click.option('-b',
+              '--batch-bits',
+              default=2**16,
+              type=click.INT,
+              help='Number of bits to score with each call to the objective.')
+@click.option('--backend',
+              default=jeweler.backend.backends[0],
+              type=click.Choice(jeweler.backend.backends),
+              help='Score codes on this device.')
 @click.option('--verbose-archive/--no-verbose-archive',
               default=False,
               help='Record best from all batches or only when a new best code is found.')
@@ -51,6 +61,8 @@ def cli(
     objective_function,
     log,
     density,
+    batch_bits,
+    backend,
     verbose_archive,
 ):
     """Find the best binary sequences LENGTH_MIN..LENGTH_MAX.
@@ -70,5 +82,7 @@ def cli(
         output_dir=output_dir,
         objective_function=getattr(jeweler.objective, objective_function),
         density=density,
+        batch_bits=batch_bits,
         verbose_archive=verbose_archive,
+        backend=backend,
     )
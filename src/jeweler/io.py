@@ -4,6 +4,7 @@ import fcntl
 import json
 import logging
 import os
+import tempfile
 import time
 
 import pandas
@@ -195,39 +196,45 @@ class ArchiverPandas(object):
         self.last_write = time.time()
         self._needs_dump = False
         if os.path.isfile(self.filename):
-            already_exists = True
-            mode = 'r+'
-        else:
-            already_exists = False
-            mode = 'w'
-        with open(self.filename, mode) as f:
-            if already_exists:
+            with open(self.filename, 'r') as f:
                 existing_table = pandas.io.json.read_json(f)
-                f.seek(0)  # <--- should reset file position to the beginning.
-                f.truncate()  # remove remaining part
-                self.table = existing_table.append(
-                    self.table,
-                    ignore_index=True,
-                    verify_integrity=True,
-                )
-            self.table = self.table.round({"cost": 6})
-            duplicate_keys = [
-                "objective",
-                "weight",
-                "search",
-            ]
-            if self.verbose_archive:
-                duplicate_keys.append("progress")
-            self.table.drop_duplicates(
-                subset=duplicate_keys,
-                keep='last',
-                inplace=True,
-            )
-            pandas.io.json.to_json(
-                f,
+            self.table = existing_table.append(
                 self.table,
-                indent=2,
+                ignore_index=True,
+                verify_integrity=True,
             )
+        self.table = self.table.round({"cost": 6})
+        duplicate_keys = [
+            "objective",
+            "weight",
+            "search",
+        ]
+        if self.verbose_archive:
+            duplicate_keys.append("progress")
+        self.table.drop_duplicates(
+            subset=duplicate_keys,
+            keep='last',
+            inplace=True,
+        )
+        # Replace the file in one step so an interrupted dump cannot truncate
+        # the records that are already on the disk. The temporary file is
+        # unique so that processes sharing the output directory cannot
+        # write to the same one.
+        handle, temporary = tempfile.mkstemp(
+            suffix='.json.tmp',
+            dir=self.output_dir,
+        )
+        try:
+            with os.fdopen(handle, 'w') as f:
+                pandas.io.json.to_json(
+                    f,
+                    self.table,
+                    indent=2,
+                )
+            os.replace(temporary, self.filename)
+        except BaseException:
+            os.remove(temporary)
+            raise
 
     def update(
         self,
@@ -237,9 +244,23 @@ class ArchiverPandas(object):
         objective_cost,
         weight,
         progress=0,
+        ordering=None,
     ):
-        """Update the best codes on the disk."""
-        if objective_cost > self.best_cost or self.verbose_archive:
+        """Update the best codes on the disk.
+
+        ordering names the order in which the search visits codes; progress is
+        only meaningful for a search which visits codes in the same order.
+        """
+        # Costs are stored to six decimals, and single precision scores of the
+        # same code differ in the last digits between runs, so only a larger
+        # difference replaces the best code
+        improved = objective_cost > self.best_cost and not np.isclose(
+            objective_cost,
+            self.best_cost,
+            rtol=1e-6,
+            atol=1e-6,
+        )
+        if improved or self.verbose_archive:
             self.best_cost = objective_cost
             self._needs_dump = True
             new_entry = pandas.DataFrame({
@@ -249,6 +270,7 @@ class ArchiverPandas(object):
                 "cost": objective_cost,
                 "weight": weight,
                 "progress": progress,
+                "ordering": ordering,
             })
             self.table = self.table.append(
                 new_entry,
@@ -264,8 +286,13 @@ class ArchiverPandas(object):
         search_method: str,
         objective_function: str,
         weight: int,
+        ordering=None,
     ):
-        """Get a code and its cost from the disk."""
+        """Get a code and its cost from the disk.
+
+        If ordering is given, progress recorded under a different ordering is
+        discarded and the search restarts from the beginning.
+        """
         if os.path.isfile(self.filename):
             with open(self.filename, 'r+') as f:
                 table = pandas.io.json.read_json(f)
@@ -275,7 +302,13 @@ class ArchiverPandas(object):
                               & (table["search"] == search_method)]
                 best = table.loc[table['cost'].idxmax()]
                 self.best_cost = best["cost"]
-                return best["code"], best["cost"], best["progress"]
+                progress = best["progress"]
+                if ordering is not None and best.get("ordering") != ordering:
+                    logger.warning(f"The progress of '{search_method}' in "
+                                   f"{self.filename} was recorded in a "
+                                   f"different order. Restarting from 0.")
+                    progress = 0
+                return best["code"], best["cost"], progress
             except (ValueError, KeyError):
                 pass
         return None, -np.inf, 0
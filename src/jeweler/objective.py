@@ -1,6 +1,13 @@
 """Defines objective functions for rating codes."""
 
+import functools
+
+import numba
 import numpy as np
+import scipy.fft
+
+from jeweler.backend import get_array_module
+from jeweler.bits import unpack
 
 __all__ = [
     'spectral_flatness',
@@ -9,6 +16,46 @@ __all__ = [
 ]
 
 
+def packed(objective_function, codes, length, threshold=-np.inf):
+    """Score codes of the given length which are packed into uint64.
+
+    Objective functions with an implementation for packed codes may give up
+    early on codes which cannot score better than threshold; those codes are
+    scored -inf. Without a threshold, and for other objective functions, the
+    codes are unpacked and scored with the FFT, which is faster when no code
+    can be abandoned.
+    """
+    if (objective_function in _packed and threshold > -np.inf
+            and get_array_module(codes) is np):
+        return _packed[objective_function](codes, length, threshold)
+    return objective_function(unpack(codes, length))
+
+
+@functools.lru_cache()
+def _twiddle(length):
+    """Return the real and imaginary parts of the real DFT matrix.
+
+    Row k of the DFT matrix holds exp(-2πi k j / L) for each position j of a
+    code of length L; only the L // 2 + 1 rows returned by rfft are kept.
+    """
+    k = np.arange(length // 2 + 1)
+    j = np.arange(length)
+    W = np.exp(-2j * np.pi * np.outer(k, j) / length)
+    return np.ascontiguousarray(W.real), np.ascontiguousarray(W.imag)
+
+
+def _rfft(code, axis=-1):
+    """Return the real DFT of a batch of codes using all available cores.
+
+    Unlike numpy.fft, scipy.fft keeps float32 input in single precision.
+    Batches on the GPU are transformed with cuFFT.
+    """
+    xp = get_array_module(code)
+    if xp is not np:
+        return xp.fft.rfft(code, axis=axis)
+    return scipy.fft.rfft(code, axis=axis, workers=-1)
+
+
 def minimal_variance(code, axis=-1):
     """Return an objective function that minimizes variance of the FFT.
 
@@ -23,9 +70,120 @@ def minimal_variance(code, axis=-1):
     25(3), 795–804. https://doi.org/10.1145/1179352.1141957
 
     """
-    # TODO: For future 2D arrays use np.fft.rfftn
-    dft_mag = np.abs(np.fft.rfft(code, axis=axis))
-    return np.min(dft_mag, axis=axis) - np.var(dft_mag, axis=axis)
+    # TODO: For future 2D arrays use scipy.fft.rfftn
+    xp = get_array_module(code)
+    if xp is not np:
+        dft_mag = xp.abs(_rfft(code, axis=axis))
+        return xp.min(dft_mag, axis=axis) - xp.var(dft_mag, axis=axis)
+    dft = np.moveaxis(_rfft(code, axis=axis), axis, -1)
+    shape = dft.shape[:-1]
+    dft = dft.reshape(-1, dft.shape[-1])
+    return _min_minus_var(dft.real, dft.imag).reshape(shape)[()]
+
+
+@numba.njit(parallel=True, fastmath=True, cache=True, nogil=True)
+def _min_minus_var(real, imag):
+    """Return min(|z|) - var(|z|) of each row of z = real + i imag.
+
+    The magnitude, minimum, and variance are computed in one pass over the DFT
+    using Welford's algorithm instead of three passes with temporaries.
+    """
+    num_rows, num_bins = real.shape
+    scores = np.empty(num_rows)
+    for i in numba.prange(num_rows):
+        lowest = np.sqrt(real[i, 0]**2 + imag[i, 0]**2)
+        mean = 0.0
+        m2 = 0.0
+        for k in range(num_bins):
+            magnitude = np.sqrt(real[i, k]**2 + imag[i, k]**2)
+            lowest = min(lowest, magnitude)
+            delta = magnitude - mean
+            mean += delta / (k + 1)
+            m2 += delta * (magnitude - mean)
+        scores[i] = lowest - m2 / num_bins
+    return scores
+
+
+@functools.lru_cache()
+def _twiddle_table(length):
+    """Return partial sums of the real DFT matrix for every byte of a code.
+
+    Entry [c, b, k] is the sum of the columns of row k of the DFT matrix at
+    the set bits of byte value b when it is the cth byte of the code. The DFT
+    of a packed code is then one table row per byte instead of one column per
+    set bit.
+    """
+    num_bytes = -(-length // 8)
+    pad = ((0, 0), (0, 8 * num_bytes - length))
+    bits = (np.arange(256)[:, None] >> np.arange(8)) & 1
+    return tuple(
+        np.einsum(
+            'bj,kcj->cbk',
+            bits,
+            np.pad(W, pad).reshape(-1, num_bytes, 8),
+        ).astype(np.float32) for W in _twiddle(length))
+
+
+def _minimal_variance_packed(codes, length, threshold=-np.inf):
+    """Return minimal_variance of codes of the given length packed into uint64.
+
+    Codes which cannot score better than threshold are given a score of -inf.
+    """
+    return _min_minus_var_packed(codes, *_twiddle_table(length), threshold)
+
+
+# fastmath without the assumption that there are no infinities
+@numba.njit(
+    parallel=True,
+    fastmath={'nsz', 'arcp', 'contract', 'afn', 'reassoc'},
+    cache=True,
+    nogil=True,
+)
+def _min_minus_var_packed(codes, T_real, T_imag, threshold):
+    """Return min(|DFT|) - var(|DFT|) of each uint64 packed code.
+
+    The DFT of a binary code is the sum of the columns of the DFT matrix where
+    the code is one. These sums are looked up from _twiddle_table one byte at
+    a time and accumulated for eight frequencies at once.
+
+    Adding frequencies can only lower the minimum and raise the sum of squared
+    deviations, so min - M2 / num_bins of the frequencies computed so far
+    bounds the final score. A code is abandoned with a score of -inf as soon
+    as this bound is no better than threshold.
+    """
+    num_bytes, _, num_bins = T_real.shape
+    scores = np.empty(len(codes))
+    block_size = 256
+    step = 8
+    for block in numba.prange((len(codes) + block_size - 1) // block_size):
+        real = np.empty(step)
+        imag = np.empty(step)
+        for i in range(block * block_size,
+                       min(len(codes), (block + 1) * block_size)):
+            lowest = np.inf
+            mean = 0.0
+            m2 = 0.0
+            for start in range(0, num_bins, step):
+                stop = min(num_bins, start + step)
+                real[:] = 0.0
+                imag[:] = 0.0
+                for c in range(num_bytes):
+                    b = (codes[i] >> np.uint64(8 * c)) & np.uint64(0xFF)
+                    for k in range(start, stop):
+                        real[k - start] += T_real[c, b, k]
+                        imag[k - start] += T_imag[c, b, k]
+                for k in range(start, stop):
+                    magnitude = np.sqrt(real[k - start] * real[k - start] +
+                                        imag[k - start] * imag[k - start])
+                    lowest = min(lowest, magnitude)
+                    delta = magnitude - mean
+                    mean += delta / (k + 1)
+                    m2 += delta * (magnitude - mean)
+                if lowest - m2 / num_bins <= threshold:
+                    lowest = -np.inf
+                    break
+            scores[i] = lowest - m2 / num_bins
+    return scores
 
 
 def spectral_flatness(code, axis=-1):
@@ -35,10 +193,11 @@ def spectral_flatness(code, axis=-1):
     by the arithmetic mean of the power spectrum.
 
     """
-    dft = np.fft.rfft(code, axis=axis)
-    power_spectrum = np.square(np.abs(dft))
+    xp = get_array_module(code)
+    dft = _rfft(code, axis=axis)
+    power_spectrum = xp.square(xp.abs(dft))
     N = power_spectrum.shape[-1]
-    return np.prod(power_spectrum, axis=axis)**(1 / N) / np.mean(
+    return xp.prod(power_spectrum, axis=axis)**(1 / N) / xp.mean(
         power_spectrum, axis=axis)
 
 
@@ -54,7 +213,7 @@ def _cui_criterion(code, axis=-1, alpha=[2, 1, 0.075, 0.024]):
     https://doi.org/10.1016/j.optlaseng.2020.106489.
     """
     L = code.shape[axis]
-    mtf = np.abs(np.fft.rfft(code, axis=axis))
+    mtf = np.abs(_rfft(code, axis=axis))
     raise NotImplementedError()
     # FIXME: Signal-to-noise objective requires information about camera
     # P = [1]
@@ -90,7 +249,17 @@ def coded_factor(code, axis=-1, λ=8.5):
     Exposure Imaging.” International Journal of Computer Vision 123 (2):
     1–18. https://doi.org/10.1007/s11263-016-0976-4.
     """
+    xp = get_array_module(code)
     L = code.shape[axis]
-    mtf = np.abs(np.fft.fft(code, axis=axis))
-    v = np.var(mtf, axis=axis) + 1e-16
-    return (L * L) / v + λ * np.min(np.log(mtf + 1e-16), axis=axis)
+    if xp is np:
+        mtf = np.abs(scipy.fft.fft(code, axis=axis, workers=-1))
+    else:
+        mtf = xp.abs(xp.fft.fft(code, axis=axis))
+    v = xp.var(mtf, axis=axis) + 1e-16
+    return (L * L) / v + λ * xp.min(xp.log(mtf + 1e-16), axis=axis)
+
+
+# Objective functions which can score packed codes without unpacking them
+_packed = {
+    minimal_variance: _minimal_variance_packed,
+}
@@ -5,21 +5,32 @@ codes. In order to do this we can take advantage of the invariance of the
 Fourier transform to translation. This means that codes which are a translation
 of another code are redundant.
 
-The following transformations are not redundant:
+The following transformations are not redundant for codes in general:
     rotation
     flips across any axis
 
+However, the magnitude of the DFT of a 1D code is invariant to reversal, so the
+lyndon search also skips codes whose reversal it scores instead. The exhaustive
+search scores every code.
 """
 
 import itertools
 import logging
+import math
+import queue
+import threading
 import time
 
+import numba
 import numpy as np
 from numpy.random import default_rng
 from sage.all import LyndonWords
 from tqdm import tqdm
 
+import jeweler.backend
+import jeweler.objective
+from jeweler.backend import to_device
+from jeweler.bits import pack, unpack
 from jeweler.io import ArchiverPandas
 
 __all__ = [
@@ -51,28 +62,123 @@ def _find_codes_prototype(K, L, output_dir, objective_function, density):
     pass
 
 
-def _lyndon_chunk(necklaces, chunksize):
-    """Wrap a sage.Necklaces instance in a Python generator.
+def _progress(batches, desc, total):
+    """Wrap batches in a progress bar shared by all of the searches.
+
+    The bar is redrawn at most once a second and about 200 times in total, and
+    tqdm hides it when stderr is not a terminal.
+    """
+    return tqdm(
+        batches,
+        desc=desc,
+        smoothing=0.05,
+        total=total,
+        mininterval=1.0,
+        miniters=max(1, total // 200),
+        disable=None,
+    )
+
+
+def _prefetch(iterable, size=2):
+    """Yield from iterable while a background thread produces the next items.
+
+    Enumerating codes in Python holds the GIL, but the objective functions
+    release it, so the next batches are enumerated while one is scored.
+    """
+    items = queue.Queue(maxsize=size)
+    done = object()
+    stop = threading.Event()
+
+    def put(item):
+        """Wait for room in the queue unless the consumer has stopped."""
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except Exception as error:
+            put((done, error))
+        else:
+            put((done, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    # Stop the producer when this generator is closed or raises, so that it
+    # does not wait forever on a queue which is no longer read
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def _lyndon_chunk(necklaces, batch_size):
+    """Wrap a sage.Necklaces instance in a generator of packed codes.
 
     Parameters
     ----------
     necklages : sage.Necklaces
-        A SageMath necklage class instance.
-    chunksize : 2-tuple
-        The shape of the desired chunk of necklaces.
+        A SageMath necklage class instance with the alphabet {1, 2}.
+    batch_size : int
+        The number of necklaces in each chunk.
+    """
+    necklaces = iter(necklaces)
+    while True:
+        chunk = list(itertools.islice(necklaces, batch_size))
+        if not chunk:
+            return
+        # Converting all letters at once avoids copying one row at a time
+        letters = np.frombuffer(
+            bytes(itertools.chain.from_iterable(chunk)),
+            dtype=np.uint8,
+        )
+        yield pack(letters.reshape(len(chunk), -1) - 1)
+
+
+@numba.njit(parallel=True, cache=True, nogil=True)
+def _drop_reversals(codes, length):
+    """Return a mask which keeps one of each pair of reversed packed codes.
+
+    Reversing a code does not change the magnitude of its DFT, so a Lyndon
+    word and the Lyndon word of its reversal always have the same score. A
+    code is kept if its smallest rotation is no larger than the smallest
+    rotation of its reversal; codes equal to their reversal are kept.
     """
-    assert chunksize[1] == len(necklaces.first())
-    chunk = np.empty(chunksize, dtype='float32')
-    i = 0
-    for x in necklaces:
-        chunk[i] = x
-        i += 1
-        if i >= chunksize[0]:
-            yield chunk - 1
-            chunk = np.empty(chunksize, dtype='float32')
-            i = 0
-    if i > 0:
-        yield chunk[:i] - 1
+    full = np.uint64(0xFFFFFFFFFFFFFFFF) >> np.uint64(64 - length)
+    keep = np.empty(len(codes), dtype=np.bool_)
+    for i in numba.prange(len(codes)):
+        forward = codes[i]
+        backward = np.uint64(0)
+        for j in range(length):
+            if (forward >> np.uint64(j)) & np.uint64(1):
+                backward |= np.uint64(1) << np.uint64(length - 1 - j)
+        lowest_forward = forward
+        lowest_backward = backward
+        for r in range(1, length):
+            a = np.uint64(r)
+            b = np.uint64(length - r)
+            lowest_forward = min(
+                lowest_forward,
+                ((forward >> a) | (forward << b)) & full,
+            )
+            lowest_backward = min(
+                lowest_backward,
+                ((backward >> a) | (backward << b)) & full,
+            )
+        keep[i] = lowest_forward <= lowest_backward
+    return keep
 
 
 def lyndon(
@@ -81,8 +187,9 @@ def lyndon(
     output_dir,
     objective_function,
     density=0.5,
-    batch_bits=4096,
+    batch_bits=2**16,
     verbose_archive=False,
+    backend='cpu',
 ):
     """Search lyndon words of length L and fixed content for the best binary code.
 
@@ -100,7 +207,12 @@ def lyndon(
         The sum of the code divided by the length of the code
     batch_bits: int
         The number of bits to try at once. Limits memory consumption.
+    backend : str
+        The device on which codes are scored; one of jeweler.backend.backends
     """
+    if L > 64:
+        raise ValueError("Lyndon search is limited to codes of length 64.")
+    jeweler.backend.check(backend)
     logger.info(f"Fixed-content Lyndon words of length {K}..{L}.")
     logger.info(f"the objective is '{objective_function.__name__}'.")
     logger.info(f"code density is {density:g}.")
@@ -126,22 +238,30 @@ def lyndon(
             number_of_batches = (ncodes // batch_size +
                                  1 if batch_size < ncodes
                                  or ncodes % batch_size > 0 else 0)
-            for batch in tqdm(
-                    _lyndon_chunk(codes, (batch_size, length)),
-                    desc=f"fixed-content Lyndon words 1D {length:d}-bit code",
-                    smoothing=0.05,
-                    total=number_of_batches,
+            for batch in _progress(
+                    _prefetch(_lyndon_chunk(codes, batch_size)),
+                    f"fixed-content Lyndon words 1D {length:d}-bit code",
+                    number_of_batches,
             ):
                 progress += len(batch)
                 if progress < progress_best:
                     continue
-                scores = objective_function(batch)
-                best = np.argmax(scores)
+                batch = batch[_drop_reversals(batch, length)]
+                if len(batch) == 0:
+                    continue
+                scores = jeweler.objective.packed(
+                    objective_function,
+                    to_device(batch, backend),
+                    length,
+                    # Every batch is recorded in a verbose archive
+                    threshold=-np.inf if verbose_archive else f.best_cost,
+                )
+                best = int(scores.argmax())
                 f.update(
                     'lyndon',
                     objective_function.__name__,
-                    best_code=batch[best].astype('int', copy=False),
-                    objective_cost=scores[best],
+                    best_code=unpack(batch[best], length, dtype='int'),
+                    objective_cost=float(scores[best]),
                     weight=weight,
                     progress=progress,
                 )
@@ -149,19 +269,47 @@ def lyndon(
         logger.info(f"This search took {after - before:.3e} seconds.")
 
 
-def _exhaustive_batch(batch_size, length, weight):
-    combinations = itertools.combinations(range(length), weight)
-    try:
-        while True:
-            count = 0
-            codes = np.zeros((batch_size, length), dtype=np.float32)
-            for row in codes:
-                row[list(next(combinations))] = 1
-                count += 1
-            yield codes
-    except StopIteration:
-        if count > 0:
-            yield codes[:count]
+@numba.njit(cache=True)
+def _fill_next_codes(state, out):
+    """Fill out with the next codes of fixed weight in increasing order.
+
+    The codes are enumerated with Gosper's hack which finds the next larger
+    integer with the same number of set bits. state holds the next code and
+    the number of codes remaining. Return the number of codes written.
+    """
+    v, remaining = state
+    count = 0
+    while count < len(out) and remaining > 0:
+        out[count] = v
+        count += 1
+        remaining -= np.uint64(1)
+        if remaining > 0:
+            c = v & (~v + np.uint64(1))  # lowest set bit
+            r = v + c
+            v = (((r ^ v) >> np.uint64(2)) // c) | r
+    state[0] = v
+    state[1] = remaining
+    return count
+
+
+# Codes are visited in increasing integer order instead of the lexicographic
+# order of itertools.combinations used by older versions
+_EXHAUSTIVE_ORDERING = 'gosper'
+
+
+def _exhaustive_batch(batch_size, weight, ncodes):
+    """Yield all ncodes codes of the given weight packed into uint64.
+
+    The same buffer is refilled for every batch, so each batch must be
+    consumed before the next one is requested.
+    """
+    state = np.array([(1 << weight) - 1, ncodes], dtype=np.uint64)
+    codes = np.empty(batch_size, dtype=np.uint64)
+    while True:
+        count = _fill_next_codes(state, codes)
+        if count == 0:
+            return
+        yield codes[:count]
 
 
 def exhaustive(
@@ -170,8 +318,9 @@ def exhaustive(
     output_dir,
     objective_function,
     density=0.5,
-    batch_bits=4096,
+    batch_bits=2**16,
     verbose_archive=False,
+    backend='cpu',
 ):
     """Find the best binary code of length L using a brute force search.
 
@@ -189,7 +338,12 @@ def exhaustive(
         The sum of the code divided by the length of the code
     batch_bits: int
         The number of bits to try at once. Limits memory consumption.
+    backend : str
+        The device on which codes are scored; one of jeweler.backend.backends
     """
+    if L > 64:
+        raise ValueError("Exhaustive search is limited to codes of length 64.")
+    jeweler.backend.check(backend)
     logger.info(f"Fixed-content exhaustive words of length {K}..{L}.")
     logger.info(f"the objective is '{objective_function.__name__}'.")
     logger.info(f"code density is {density:g}.")
@@ -207,45 +361,57 @@ def exhaustive(
                 'exhaustive',
                 objective_function.__name__,
                 weight,
+                ordering=_EXHAUSTIVE_ORDERING,
             )
             progress = 0
 
-            ncodes = (np.math.factorial(length) //
-                      (np.math.factorial(weight) *
-                       np.math.factorial(length - weight)))
+            ncodes = math.comb(length, weight)
             number_of_batches = (ncodes // batch_size +
                                  1 if batch_size < ncodes
                                  or ncodes % batch_size > 0 else 0)
-            for batch in tqdm(
-                    _exhaustive_batch(batch_size, length, weight),
-                    desc="exhaustive 1D {:d}-bit code".format(length),
-                    smoothing=0.05,
-                    total=number_of_batches,
+            for batch in _progress(
+                    _exhaustive_batch(batch_size, weight, ncodes),
+                    "exhaustive 1D {:d}-bit code".format(length),
+                    number_of_batches,
             ):
                 progress += len(batch)
                 if progress < progress_best:
                     continue
-                scores = objective_function(batch)
-                best = np.argmax(scores)
+                scores = jeweler.objective.packed(
+                    objective_function,
+                    to_device(batch, backend),
+                    length,
+                    # Every batch is recorded in a verbose archive
+                    threshold=-np.inf if verbose_archive else f.best_cost,
+                )
+                best = int(scores.argmax())
                 f.update(
                     'exhaustive',
                     objective_function.__name__,
-                    best_code=batch[best].astype('int', copy=False),
-                    objective_cost=scores[best],
+                    best_code=unpack(batch[best], length, dtype='int'),
+                    objective_cost=float(scores[best]),
                     weight=weight,
                     progress=progress,
+                    ordering=_EXHAUSTIVE_ORDERING,
                 )
         after = time.time()
         logger.info(f"This search took {after - before:.3e} seconds.")
 
 
 def _random_batch(batch_size, L, k, num_batch):
-    """Return a random batch of with length L and weight k."""
+    """Return a random batch of with length L and weight k.
+
+    The same buffer is refilled for every batch, so each batch must be
+    consumed before the next one is requested.
+    """
     rng = default_rng()
+    codes = np.empty((batch_size, L), dtype=np.float32)
+    rows = np.arange(batch_size, dtype=np.int32)[:, None]
     for _ in range(num_batch):
-        codes = np.zeros((batch_size, L), dtype=np.float32)
-        for row in codes:
-            row[rng.choice(L, k, replace=False)] = 1
+        codes.fill(0)
+        # The first k positions of a random permutation of each row
+        ones = rng.random((batch_size, L)).argsort(axis=1)[:, :k]
+        codes[rows, ones] = 1
         yield codes
 
 
@@ -255,8 +421,9 @@ def random(
     output_dir,
     objective_function,
     density=0.5,
-    batch_bits=4096,
+    batch_bits=2**16,
     verbose_archive=False,
+    backend='cpu',
 ):
     """Find the best binary code of length L using a random search.
 
@@ -274,7 +441,10 @@ def random(
         The sum of the code divided by the length of the code
     batch_bits: int
         The number of bits to try at once. Limits memory consumption.
+    backend : str
+        The device on which codes are scored; one of jeweler.backend.backends
     """
+    jeweler.backend.check(backend)
     logger.info(f"Fixed-content random words of length {K}..{L}.")
     logger.info(f"the objective is '{objective_function.__name__}'.")
     logger.info(f"code density is {density:g}.")
@@ -294,27 +464,24 @@ def random(
                 weight,
             )
 
-            ncodes = (np.math.factorial(length) //
-                      (np.math.factorial(weight) *
-                       np.math.factorial(length - weight))) // 10
+            ncodes = math.comb(length, weight) // 10
             number_of_batches = (ncodes // batch_size +
                                  1 if batch_size < ncodes
                                  or ncodes % batch_size > 0 else 0)
-            for batch in tqdm(
+            for batch in _progress(
                     _random_batch(batch_size, length, weight,
                                   number_of_batches),
-                    desc="random 1D {:d}-bit code".format(length),
-                    smoothing=0.05,
-                    total=number_of_batches,
+                    "random 1D {:d}-bit code".format(length),
+                    number_of_batches,
             ):
-                scores = objective_function(batch)
-                best = np.argmax(scores)
+                scores = objective_function(to_device(batch, backend))
+                best = int(scores.argmax())
                 progress += len(scores)
                 f.update(
                     'random',
                     objective_function.__name__,
                     best_code=batch[best].astype('int', copy=False),
-                    objective_cost=scores[best],
+                    objective_cost=float(scores[best]),
                     weight=weight,
                     progress=progress,
                 )
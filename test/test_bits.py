@@ -0,0 +1,40 @@
+import unittest
+
+import numpy as np
+
+from jeweler.bits import pack, unpack
+from jeweler.objective import _minimal_variance_packed, minimal_variance
+
+
+class TestPackedCodes(unittest.TestCase):
+    """Check that codes survive packing into uint64."""
+    def setUp(self):
+        super().setUp()
+        self.rng = np.random.default_rng(0)
+
+    def test_round_trip(self):
+        for length in [1, 8, 13, 63, 64]:
+            codes = self.rng.integers(0, 2, size=(100, length))
+            codes[0] = 1  # the highest bit must survive too
+            np.testing.assert_array_equal(
+                unpack(pack(codes), length, dtype=int),
+                codes,
+            )
+
+    def test_too_long(self):
+        with self.assertRaises(ValueError):
+            pack(np.ones((3, 65)))
+
+    def test_packed_minimal_variance(self):
+        for length in [1, 8, 13, 63, 64]:
+            codes = self.rng.integers(0, 2, size=(100, length))
+            codes = codes.astype(np.float32)
+            np.testing.assert_allclose(
+                _minimal_variance_packed(pack(codes), length),
+                minimal_variance(codes),
+                atol=1e-5,
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from jeweler.io import ArchiverPandas
+
+
+class TestArchiverOrdering(unittest.TestCase):
+    """Check that progress is only resumed in the order it was recorded."""
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            with ArchiverPandas(output_dir, 4, False) as f:
+                f.update('exhaustive', 'minimal_variance', [1, 1, 0, 0], -1.0,
+                         2, progress=3)
+                f.update('random', 'minimal_variance', [1, 0, 1, 0], -0.5, 2,
+                         progress=5, ordering='gosper')
+            with ArchiverPandas(output_dir, 4, False) as f:
+                _, cost, progress = f.fetch('exhaustive', 'minimal_variance',
+                                            2)
+                self.assertEqual(progress, 3)
+                with self.assertLogs('jeweler.io', 'WARNING'):
+                    _, cost, progress = f.fetch('exhaustive',
+                                                'minimal_variance', 2,
+                                                ordering='gosper')
+                self.assertEqual(cost, -1.0)
+                self.assertEqual(progress, 0)
+                _, _, progress = f.fetch('random', 'minimal_variance', 2,
+                                         ordering='gosper')
+                self.assertEqual(progress, 5)
+
+
+class TestArchiverUpdate(unittest.TestCase):
+    def test_rounding(self):
+        """Rounding errors in the cost do not replace the best code."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            with ArchiverPandas(output_dir, 4, False) as f:
+                f.update('exhaustive', 'minimal_variance', [1, 1, 0, 0], 2.0,
+                         2)
+                f.update('exhaustive', 'minimal_variance', [1, 0, 1, 0],
+                         2.0000002, 2)
+                self.assertEqual(len(f.table), 1)
+                f.update('exhaustive', 'minimal_variance', [1, 0, 1, 0], 2.1,
+                         2)
+                self.assertEqual(len(f.table), 2)
+
+
+class TestArchiverDump(unittest.TestCase):
+    def test_failed_dump(self):
+        """A failed dump keeps the archive and removes its temporary file."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            with ArchiverPandas(output_dir, 4, False) as f:
+                f.update('exhaustive', 'minimal_variance', [1, 1, 0, 0], -1.0,
+                         2)
+            with ArchiverPandas(output_dir, 4, False) as f:
+                f.update('exhaustive', 'minimal_variance', [1, 0, 1, 0], -0.5,
+                         2)
+                with mock.patch('pandas.io.json.to_json',
+                                side_effect=OSError):
+                    with self.assertRaises(OSError):
+                        f.__dump__()
+                self.assertEqual(os.listdir(output_dir), ['4.json'])
+                with open(os.path.join(output_dir, '4.json')) as archive:
+                    self.assertEqual(json.load(archive)['cost'], {'0': -1.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from jeweler.bits import pack
+from jeweler.io import ArchiverPandas
+from jeweler.objective import (_minimal_variance_packed, minimal_variance,
+                               packed)
+
+
+class TestPackedThreshold(unittest.TestCase):
+    """Check that abandoning codes early never changes the best code."""
+    def setUp(self):
+        super().setUp()
+        rng = np.random.default_rng(0)
+        self.length = 32
+        self.codes = pack(rng.integers(0, 2, size=(4096, self.length)))
+        self.scores = _minimal_variance_packed(self.codes, self.length)
+
+    def test_pruned_scores(self):
+        threshold = np.sort(self.scores)[-10] - 1e-6
+        scores = packed(minimal_variance, self.codes, self.length, threshold)
+        pruned = np.isneginf(scores)
+        self.assertTrue(pruned.any())
+        np.testing.assert_array_equal(scores[~pruned], self.scores[~pruned])
+        self.assertTrue(np.all(self.scores[pruned] <= threshold))
+
+    def test_all_pruned(self):
+        threshold = self.scores.max()
+        scores = packed(minimal_variance, self.codes, self.length, threshold)
+        self.assertTrue(np.all(np.isneginf(scores)))
+        with tempfile.TemporaryDirectory() as output_dir:
+            with ArchiverPandas(output_dir, self.length, False) as f:
+                f.update('lyndon', 'minimal_variance', [1] * self.length,
+                         float(threshold), self.length)
+                best = int(scores.argmax())
+                f.update('lyndon', 'minimal_variance', [0] * self.length,
+                         float(scores[best]), self.length)
+                self.assertEqual(len(f.table), 1)
+                self.assertEqual(f.best_cost, threshold)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import itertools
+import math
+import os
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from jeweler.bits import pack
+from jeweler.io import ArchiverPandas
+from jeweler.lyndon import LyndonWordsWithLength
+from jeweler.objective import minimal_variance
+import jeweler.backend
+from jeweler.search import (_drop_reversals, _exhaustive_batch, _prefetch,
+                            exhaustive, lyndon, random)
+
+
+def bracelet(code):
+    """Return the smallest rotation of the code or its reversal."""
+    code = list(code)
+    rotations = [code[i:] + code[:i] for i in range(len(code))]
+    rotations += [r[::-1] for r in rotations]
+    return tuple(min(rotations))
+
+
+class TestDropReversals(unittest.TestCase):
+    """Check that one Lyndon word is kept for each bracelet."""
+    def test_one_per_bracelet(self):
+        for length, weight in [(6, 3), (8, 4), (12, 5), (13, 6), (16, 8)]:
+            words = np.array([
+                list(w) for w in LyndonWordsWithLength(2, length)
+                if sum(w) == weight
+            ])
+            keep = _drop_reversals(pack(words), length)
+            bracelets = {bracelet(w) for w in words}
+            self.assertEqual(keep.sum(), len(bracelets))
+            self.assertEqual({bracelet(w) for w in words[keep]}, bracelets)
+
+    def test_full_width(self):
+        words = np.zeros((2, 64), dtype=int)
+        words[0, [0, 1, 3]] = 1  # [1, 1, 0, 1, 0, ...]
+        words[1, [0, 2, 3]] = 1  # [1, 0, 1, 1, 0, ...], its reversal
+        keep = _drop_reversals(pack(words), 64)
+        self.assertEqual(keep.sum(), 1)
+
+
+class TestExhaustiveBatch(unittest.TestCase):
+    """Check Gosper's hack against itertools.combinations."""
+    def test_all_combinations(self):
+        for length, weight in [(10, 5), (12, 0), (12, 12), (64, 2), (64, 63)]:
+            # The batch buffer is reused, so copy each batch as it is made
+            batches = [
+                b.tolist() for b in _exhaustive_batch(
+                    7, weight, math.comb(length, weight))
+            ]
+            self.assertTrue(all(len(b) == 7 for b in batches[:-1]))
+            codes = [x for b in batches for x in b]
+            expected = {
+                sum(1 << j for j in c)
+                for c in itertools.combinations(range(length), weight)
+            }
+            self.assertEqual(len(codes), len(expected))
+            self.assertEqual(set(codes), expected)
+
+
+class TestPrefetch(unittest.TestCase):
+    def test_close(self):
+        """The producer stops once nothing reads its items."""
+        before = set(threading.enumerate())
+        items = _prefetch(itertools.count())
+        self.assertEqual(next(items), 0)
+        producers = set(threading.enumerate()) - before
+        self.assertEqual(len(producers), 1)
+        items.close()
+        for thread in producers:
+            thread.join(timeout=5)
+            self.assertFalse(thread.is_alive())
+
+    def test_error(self):
+        """Errors of the producer are raised by the consumer."""
+        def fail():
+            yield 0
+            raise KeyError
+
+        items = _prefetch(fail())
+        self.assertEqual(next(items), 0)
+        with self.assertRaises(KeyError):
+            next(items)
+
+
+class TestSearch(unittest.TestCase):
+    """Check the best archived codes against scoring every code."""
+    def setUp(self):
+        super().setUp()
+        self.lengths = range(6, 17)
+
+    def expected(self, length):
+        weight = length // 2
+        codes = np.zeros((math.comb(length, weight), length))
+        for i, c in enumerate(
+                itertools.combinations(range(length), weight)):
+            codes[i, list(c)] = 1
+        return minimal_variance(codes).max()
+
+    def check(self, search, **kwargs):
+        with tempfile.TemporaryDirectory() as output_dir:
+            search(min(self.lengths), max(self.lengths), output_dir,
+                   minimal_variance, **kwargs)
+            for length in self.lengths:
+                with ArchiverPandas(output_dir, length, False) as f:
+                    _, cost, _ = f.fetch(search.__name__, 'minimal_variance',
+                                         length // 2)
+                self.assertAlmostEqual(cost, self.expected(length), places=5)
+
+    def test_lyndon(self):
+        self.check(lyndon)
+
+    def test_batches_of_reversals(self):
+        """Batches where every word is a dropped reversal are skipped."""
+        self.check(lyndon, batch_bits=1)
+
+    def test_exhaustive(self):
+        self.check(exhaustive, batch_bits=64)
+
+
+class TestBackend(unittest.TestCase):
+    def test_unavailable_backend(self):
+        """An unusable backend is rejected before any archive is written."""
+        backends = {'tpu': ValueError}
+        if jeweler.backend.cupy is None:
+            backends['cuda'] = ImportError
+        for search in [lyndon, exhaustive, random]:
+            for backend, error in backends.items():
+                with tempfile.TemporaryDirectory() as output_dir:
+                    with self.assertRaises(error):
+                        search(8, 8, output_dir, minimal_variance,
+                               backend=backend)
+                    self.assertEqual(os.listdir(output_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()